@@ -1,10 +1,77 @@
 import os
-import json
-import pandas as pd
-from io import BytesIO
+import csv
+import sys
+import time
+import asyncio
+import tempfile
+import orjson
+import xlsxwriter
+import google.auth
+from google.api_core import retry
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import compute_v1
 from google.cloud import storage
+from google.cloud import monitoring_v3
+from requests.adapters import HTTPAdapter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# compute_v1 목록 조회 재시도 정책 (기본 재시도가 없음, 페이저는 첫 페이지 요청에만 적용)
+# storage/monitoring은 라이브러리 기본 재시도가 더 넓으므로 지정하지 않음
+_TRANSIENT_RETRY = retry.Retry(predicate=retry.if_transient_error, deadline=60)
+
+# bytes -> GB 변환 계수 (나눗셈 대신 곱셈)
+_INV_GB = 1.0 / (1 << 30)
+
+# GCS blob 나열 동시 실행 수 (HTTP 연결 풀 크기와 동일하게 유지)
+_GCS_MAX_WORKERS = 16
+
+# GCS resumable 업로드 청크 크기 (256KB의 배수)
+_UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# E2 공유 코어 타입별 (vCPU, 메모리 GB)
+_SHARED_CORE_SPECS = {
+    'e2-micro': (0.25, 1),
+    'e2-small': (0.5, 2),
+    'e2-medium': (1, 4),
+}
+
+# 패밀리별 vCPU당 메모리 GB (N2, E2 공통)
+_FAMILY_MEM_PER_CPU = {
+    'standard': 4,
+    'highmem': 8,
+    'highcpu': 1,
+}
+
+def _compute_machine_specs(machine_type):
+    """N2, E2 시리즈 전용 정확한 CPU/메모리 스펙"""
+    
+    # E2 공유 코어 타입들
+    shared_core_specs = _SHARED_CORE_SPECS.get(machine_type)
+    if shared_core_specs is not None:
+        return shared_core_specs
+    
+    # 패턴 기반 계산: {series}-{family}-{cpu}[-{custom memory MB}]
+    parts = machine_type.split('-')
+    if len(parts) < 3:
+        return (2, 8)  # 기본값
+    
+    try:
+        cpu_count = int(parts[2])
+    except ValueError:
+        return (2, 8)
+    
+    if parts[1] == 'custom':
+        try:
+            return (cpu_count, int(parts[3]) / 1024)     # Custom memory 계산
+        except (IndexError, ValueError):
+            return (2, 8)
+    
+    memory_gb = cpu_count * _FAMILY_MEM_PER_CPU.get(parts[1], 4)
+    return (cpu_count, memory_gb)
+
+# 실행 중 확인된 머신 타입별 (vCPU, 메모리 GB) 테이블 (타입별 1회만 계산)
+_MACHINE_SPECS = {}
 
 class GCPResourceCollector:
     def __init__(self, project_id):
@@ -12,150 +79,134 @@ class GCPResourceCollector:
         self.compute_client = compute_v1.InstancesClient()
         self.disk_client = compute_v1.DisksClient()
         self.snapshot_client = compute_v1.SnapshotsClient()
-        self.storage_client = storage.Client()
-    
-    def get_machine_specs(self, machine_type):
-        """N2, E2 시리즈 전용 정확한 CPU/메모리 스펙"""
-        
-        # E2 공유 코어 타입들
-        if machine_type == 'e2-micro':
-            return (0.25, 1)
-        elif machine_type == 'e2-small':
-            return (0.5, 2)
-        elif machine_type == 'e2-medium':
-            return (1, 4)
-        
-        # 패턴 기반 계산
-        parts = machine_type.split('-')
-        if len(parts) < 3:
-            return (2, 8)  # 기본값
-            
-        custom_memory = int(parts[-1])
-        
-        try:
-            cpu_count = int(parts[2])
-        except ValueError:
-            return (2, 8)
-        
-        if 'standard' in machine_type:
-            memory_gb = cpu_count * 4     # vCPU당 4GB
-        elif 'highmem' in machine_type:
-            memory_gb = cpu_count * 8     # vCPU당 8GB
-        elif 'highcpu' in machine_type:
-            memory_gb = cpu_count * 1     # vCPU당 1GB
-        elif 'custom' in machine_type:
-            memory_gb = custom_memory / 1024     # Custom memory 계산
-        else:
-            memory_gb = cpu_count * 4
-            
-        
-        return (cpu_count, memory_gb)
+        # 버킷 병렬 조회 워커 수만큼 keep-alive 연결을 유지하도록 HTTP 연결 풀을 확장한 세션을 직접 만들어 전달
+        # (requests 기본값 10개, 클라이언트 내부 세션을 수정하지 않음 / mTLS가 필요하면 이 세션에서 설정)
+        credentials, _ = google.auth.default(scopes=storage.Client.SCOPE)
+        gcs_session = AuthorizedSession(credentials)
+        gcs_session.mount('https://', HTTPAdapter(pool_connections=_GCS_MAX_WORKERS, pool_maxsize=_GCS_MAX_WORKERS))
+        self.storage_client = storage.Client(credentials=credentials, _http=gcs_session)
+        self.monitoring_client = monitoring_v3.MetricServiceClient()
+        self._disk_cache = {}
     
     def get_compute_resources(self):
-        """인스턴스별 상세 CPU/Memory/Disk/IP/Tags 정보 수집"""
+        """인스턴스별 상세 CPU/Memory/Disk/IP/Tags 정보 수집 (aggregated_list 1회 호출)"""
         instances_info = []
 
         try:
-            zones_client = compute_v1.ZonesClient()
-            zones = zones_client.list(project=self.project_id)
-        
-            for zone in zones:
-                print(f"Processing zone: {zone.name}")
-                instances = self.compute_client.list(
+            # 디스크 상세 정보를 aggregated_list 1회 호출로 미리 캐싱 (디스크별 get 호출 대신)
+            # 인스턴스 목록 조회와 서로 의존하지 않으므로 백그라운드 스레드에서 동시에 진행
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                disk_cache_future = executor.submit(self._load_disk_cache)
+
+                # 모든 존의 인스턴스를 단일 페이지네이션 호출로 조회 (n2, e2 시리즈만 서버에서 필터링)
+                request = compute_v1.AggregatedListInstancesRequest(
                     project=self.project_id,
-                    zone=zone.name
+                    filter='machineType eq ".*/(n2|e2)-.*"'
                 )
-            
-                for instance in instances:
-                    # 인스턴스 기본 정보 추출
-                    instance_name = instance.name if hasattr(instance, 'name') else 'unknown'
-                    instance_status = instance.status if hasattr(instance, 'status') else 'unknown'
-                    machine_type = instance.machine_type.split('/')[-1]
-                    series = machine_type.split('-')[0]
-                
-                    print(f"Processing instance: {instance_name} ({machine_type})")
-                
-                    # n2, e2 시리즈만 처리
-                    if series not in ['n2', 'e2']:
-                        print(f"Skipping {series} series")
-                        continue
-                
-                    specs = self.get_machine_specs(machine_type)
-                    if specs is None:
+                scoped_lists = self.compute_client.aggregated_list(request=request, retry=_TRANSIENT_RETRY)
+
+                zone_names = []
+                zone_instance_lists = []
+                for scope, scoped_list in scoped_lists:
+                    # 인스턴스가 없는 존은 건너뜀 (UNREACHABLE 등 결과 없음 외의 경고는 기록)
+                    if not scoped_list.instances:
+                        warning = scoped_list.warning
+                        if warning.code and warning.code != 'NO_RESULTS_ON_PAGE':
+                            print(f"존 {scope} 경고 ({warning.code}): {warning.message}")
                         continue
-                    
-                    cpu_count, memory_gb = specs
-                
-                    # 태그(라벨) 정보 수집
-                    tags = {}
-                    if hasattr(instance, 'labels') and instance.labels:
-                        tags = dict(instance.labels)
-                        print(f"  Tags found: {tags}")
-                    else:
-                        print(f"  No tags found for {instance_name}")
-                
-                    # IP 주소 정보 수집 (여러 가능한 속성명 시도)
-                    private_ips = []
-                    public_ips = []
-                    
-                    if hasattr(instance, 'network_interfaces') and instance.network_interfaces:
-                        for network_interface in instance.network_interfaces:
-                            # Private IP 수집 (가능한 모든 속성명 시도)
-                            private_ip = None
-                            for attr in ['network_ip', 'network_i_p', 'networkIP', 'internal_ip']:
-                                if hasattr(network_interface, attr):
-                                    private_ip = getattr(network_interface, attr)
-                                    if private_ip:
-                                        break
-                            
-                            if private_ip:
-                                private_ips.append(private_ip)
-                            
-                            # Public IP 수집 (External IP)
-                            if hasattr(network_interface, 'access_configs') and network_interface.access_configs:
-                                for access_config in network_interface.access_configs:
-                                    public_ip = None
-                                    for attr in ['nat_ip', 'nat_i_p', 'natIP', 'external_ip']:
-                                        if hasattr(access_config, attr):
-                                            public_ip = getattr(access_config, attr)
-                                            if public_ip:
-                                                break
-                                    
-                                    if public_ip:
-                                        public_ips.append(public_ip)
-                    
-                    # 디버깅용: 네트워크 인터페이스 구조 출력
-                    if hasattr(instance, 'network_interfaces') and instance.network_interfaces:
-                        print(f"Debug - Instance {instance_name} network interfaces:")
-                        for i, ni in enumerate(instance.network_interfaces):
-                            print(f"  Interface {i}: {[attr for attr in dir(ni) if not attr.startswith('_')]}")
-                            if hasattr(ni, 'access_configs') and ni.access_configs:
-                                for j, ac in enumerate(ni.access_configs):
-                                    print(f"    Access config {j}: {[attr for attr in dir(ac) if not attr.startswith('_')]}")
-                
-                    # 인스턴스의 디스크 정보 수집
-                    disks_info = self.get_instance_disks(instance, zone.name)
-                
-                    instance_data = {
-                        'name': instance_name,
-                        'zone': zone.name,
-                        'machine_type': machine_type,
-                        'status': instance_status,
-                        'cpu': cpu_count,
-                        'memory_gb': memory_gb,
-                        'private_ip': ', '.join(private_ips) if private_ips else 'None',
-                        'public_ip': ', '.join(public_ips) if public_ips else 'None',
-                        'disks': disks_info,
-                        'tags': tags  # 태그 정보 추가
-                    }
-                
-                    instances_info.append(instance_data)
-                    
+                    zone_names.append(scope.split('/')[-1])
+                    zone_instance_lists.append(scoped_list.instances)
+
+                # 디스크 캐시 실패는 인스턴스 결과에 영향을 주지 않음 (캐시에 없는 디스크는 '정보 없음' 처리)
+                try:
+                    disk_cache_future.result()
+                except Exception as e:
+                    print(f"디스크 캐시 준비 오류: {e}")
+
+            # 디스크 상세 정보는 캐시에서 조회하므로 존별 처리에 추가 RPC가 없음
+            for zone_name, zone_instance_list in zip(zone_names, zone_instance_lists):
+                instances_info.extend(self._collect_zone(zone_name, zone_instance_list))
+
         except Exception as e:
             print(f"Compute Engine 리소스 수집 오류: {e}")
 
         return instances_info
-    
+
+    def _collect_zone(self, zone_name, instances):
+        """단일 존의 인스턴스 정보 수집"""
+        zone_instances = []
+
+        print(f"Processing zone: {zone_name}")
+
+        for instance in instances:
+            # 인스턴스 기본 정보 추출
+            machine_type = instance.machine_type.split('/')[-1]
+            instance_name = instance.name or 'unknown'
+            
+            # n2, e2 시리즈만 처리 (다른 작업 전에 먼저 걸러냄)
+            if not machine_type.startswith(('n2-', 'e2-')):
+                print(f"Skipping {instance_name} ({machine_type})")
+                continue
+            
+            instance_status = instance.status or 'unknown'
+            print(f"Processing instance: {instance_name} ({machine_type})")
+        
+            specs = _MACHINE_SPECS.get(machine_type)
+            if specs is None:
+                specs = _compute_machine_specs(machine_type)
+                _MACHINE_SPECS[machine_type] = specs
+            cpu_count, memory_gb = specs
+        
+            # 태그(라벨) 정보 수집
+            tags = {}
+            if instance.labels:
+                tags = dict(instance.labels)
+                print(f"  Tags found: {tags}")
+            else:
+                print(f"  No tags found for {instance_name}")
+        
+            # IP 주소 정보 수집 (compute_v1 필드명: network_i_p, nat_i_p / 없으면 'None')
+            private_ip = ', '.join(
+                ni.network_i_p for ni in instance.network_interfaces if ni.network_i_p
+            ) or 'None'
+            public_ip = ', '.join(
+                ac.nat_i_p for ni in instance.network_interfaces for ac in ni.access_configs if ac.nat_i_p
+            ) or 'None'
+            
+            # 인스턴스의 디스크 정보 수집
+            disks_info = self.get_instance_disks(instance, zone_name)
+        
+            instance_data = {
+                'name': instance_name,
+                'zone': zone_name,
+                'machine_type': machine_type,
+                'status': instance_status,
+                'cpu': cpu_count,
+                'memory_gb': memory_gb,
+                'private_ip': private_ip,
+                'public_ip': public_ip,
+                'disks': disks_info,
+                'tags': tags  # 태그 정보 추가
+            }
+        
+            zone_instances.append(instance_data)
+
+        return zone_instances
+
+    def _load_disk_cache(self):
+        """프로젝트 전체 디스크를 self_link 키로 캐싱 (인스턴스의 disk.source와 동일한 URL, 리전 디스크 포함)"""
+        self._disk_cache = {}
+        
+        # 디스크 목록 조회 실패가 인스턴스 수집 전체를 중단시키지 않도록 여기서 처리
+        # (조회된 만큼만 캐싱, 누락된 디스크는 get_instance_disks에서 '정보 없음'으로 처리)
+        try:
+            disk_pages = self.disk_client.aggregated_list(project=self.project_id, retry=_TRANSIENT_RETRY)
+            for _, scoped_list in disk_pages:
+                for disk in scoped_list.disks:
+                    self._disk_cache[disk.self_link] = disk
+        except Exception as e:
+            print(f"디스크 목록 수집 오류 (캐싱된 디스크 {len(self._disk_cache)}개로 계속 진행): {e}")
+
     def get_instance_disks(self, instance, zone_name):
         """인스턴스별 디스크 정보 수집 (정확한 계산)"""
         disks_info = {
@@ -165,110 +216,258 @@ class GCPResourceCollector:
             'local-ssd': 0.0
         }
         
-        try:
-            if hasattr(instance, 'disks') and instance.disks:
-                for disk in instance.disks:
-                    if hasattr(disk, 'source') and disk.source:
-                        # 영구 디스크인 경우
-                        disk_name = disk.source.split('/')[-1]
-                        try:
-                            disk_detail = self.disk_client.get(
-                                project=self.project_id,
-                                zone=zone_name,
-                                disk=disk_name
-                            )
-                            disk_type = disk_detail.type.split('/')[-1]
-                            
-                            # 정확한 크기 계산 (bytes -> GB)
-                            if hasattr(disk_detail, 'size_gb'):
-                                size_gb = float(disk_detail.size_gb)
-                            elif hasattr(disk_detail, 'size_bytes'):
-                                size_gb = float(disk_detail.size_bytes) / (1024**3)
-                            else:
-                                print(f"디스크 {disk_name} 크기 정보 없음")
-                                continue
-                            
-                            # 반올림하여 소수점 2자리까지
-                            size_gb = round(size_gb, 2)
-                            
-                            if disk_type in disks_info:
-                                disks_info[disk_type] += size_gb
-                            else:
-                                print(f"알 수 없는 디스크 타입: {disk_type}")
-                            
-                        except Exception as e:
-                            print(f"디스크 {disk_name} 정보 수집 오류: {e}")
-                            
-                    elif hasattr(disk, 'type_') and disk.type_ == 'SCRATCH':
-                        # 로컬 SSD인 경우
-                        if hasattr(disk, 'disk_size_gb'):
-                            local_ssd_size = float(disk.disk_size_gb)
-                        else:
-                            # 기본값: 375GB (GCP 로컬 SSD 기본 크기)
-                            local_ssd_size = 375.0
-                        
-                        disks_info['local-ssd'] += round(local_ssd_size, 2)
+        # 오류 처리는 디스크 단위로만 수행 (한 디스크 실패가 인스턴스 전체에 영향 주지 않음)
+        for disk in instance.disks:
+            if disk.source:
+                # 영구 디스크인 경우
+                disk_name = disk.source.split('/')[-1]
+                try:
+                    disk_detail = self._disk_cache.get(disk.source)
+                    if disk_detail is None:
+                        print(f"디스크 {disk_name} 정보 없음")
+                        continue
+                    disk_type = disk_detail.type_.split('/')[-1]
                     
-        except Exception as e:
-            print(f"인스턴스 디스크 정보 수집 오류: {e}")
-        
-        # 모든 값을 소수점 2자리로 반올림
-        for key in disks_info:
-            disks_info[key] = round(disks_info[key], 2)
+                    # 디스크 크기 (GB)
+                    if not disk_detail.size_gb:
+                        print(f"디스크 {disk_name} 크기 정보 없음")
+                        continue
+                    size_gb = float(disk_detail.size_gb)
+                    
+                    if disk_type in disks_info:
+                        disks_info[disk_type] += size_gb
+                    else:
+                        print(f"알 수 없는 디스크 타입: {disk_type}")
+                    
+                except Exception as e:
+                    print(f"디스크 {disk_name} 정보 수집 오류: {e}")
+                    
+            elif disk.type_ == 'SCRATCH':
+                # 로컬 SSD인 경우 (크기 정보가 없으면 GCP 로컬 SSD 기본 크기 375GB)
+                local_ssd_size = float(disk.disk_size_gb or 375)
+                
+                disks_info['local-ssd'] += local_ssd_size
         
         return disks_info
 
     def get_snapshot_usage(self):
         """스냅샷 총 용량 (정확한 계산)"""
-        total_snapshot_gb = 0.0
+        total_snapshot_bytes = 0
         
         try:
-            snapshots = self.snapshot_client.list(project=self.project_id)
+            request = compute_v1.ListSnapshotsRequest(project=self.project_id)
+            # 용량 계산에 필요한 필드만 응답받음 (nextPageToken 누락 시 첫 페이지만 조회됨)
+            snapshots = self.snapshot_client.list(
+                request=request,
+                metadata=[('x-goog-fieldmask', 'items(storageBytes,diskSizeGb),nextPageToken')],
+                retry=_TRANSIENT_RETRY
+            )
             for snapshot in snapshots:
-                if hasattr(snapshot, 'storage_bytes') and snapshot.storage_bytes:
-                    # bytes를 GB로 정확히 변환
-                    snapshot_gb = float(snapshot.storage_bytes) / (1024**3)
-                    total_snapshot_gb += snapshot_gb
-                elif hasattr(snapshot, 'disk_size_gb') and snapshot.disk_size_gb:
-                    # 이미 GB 단위인 경우
-                    total_snapshot_gb += float(snapshot.disk_size_gb)
+                if snapshot.storage_bytes:
+                    total_snapshot_bytes += snapshot.storage_bytes
+                elif snapshot.disk_size_gb:
+                    # storage_bytes 계산 전인 경우 디스크 크기(GB)로 대체
+                    total_snapshot_bytes += snapshot.disk_size_gb * (1024**3)
                     
         except Exception as e:
             print(f"스냅샷 리소스 수집 오류: {e}")
         
-        return round(total_snapshot_gb, 2)
+        # bytes를 GB로 한 번만 변환
+        return round(total_snapshot_bytes * _INV_GB, 2)
 
     def get_gcs_usage(self):
-        """GCS 버킷별 용량 (정확한 GB 계산)"""
+        """GCS 버킷별 용량 (Monitoring 지표 우선, 없으면 blob 합산)"""
         gcs_usage = {}
-        total_gcs_gb = 0.0
+        total_gcs_bytes = 0
         
         try:
             buckets = self.storage_client.list_buckets(project=self.project_id)
-            for bucket in buckets:
-                bucket_size_bytes = 0
-                print(f"Processing bucket: {bucket.name}")
-                
-                try:
-                    blobs = self.storage_client.list_blobs(bucket.name)
-                    for blob in blobs:
-                        if hasattr(blob, 'size') and blob.size:
-                            bucket_size_bytes += int(blob.size)
-                except Exception as e:
-                    print(f"버킷 {bucket.name} 처리 오류: {e}")
-                
-                # bytes를 GB로 정확히 변환
-                bucket_size_gb = round(float(bucket_size_bytes) / (1024**3), 2)
-                gcs_usage[bucket.name] = bucket_size_gb
-                total_gcs_gb += bucket_size_gb
+            bucket_names = [bucket.name for bucket in buckets]
+            
+            # 버킷 용량 지표를 한 번에 조회 (버킷당 blob 전체 나열 대신)
+            metric_sizes = self._get_bucket_sizes_from_monitoring()
+            missing_buckets = [name for name in bucket_names if name not in metric_sizes]
+            if missing_buckets:
+                print(f"Monitoring 지표가 없는 버킷 {len(missing_buckets)}개는 blob 합산으로 계산")
+            
+            # 지표가 없는 버킷(신규 버킷 등)만 blob 나열로 계산 (GCS 요청 한도를 고려해 동시 실행 수 제한)
+            with ThreadPoolExecutor(max_workers=_GCS_MAX_WORKERS) as executor:
+                fallback_sizes = dict(zip(missing_buckets, executor.map(self._get_bucket_size, missing_buckets)))
+            
+            # 합계는 bytes로 누적하고 GB 변환은 버킷/합계별로 한 번만 수행
+            for bucket_name in bucket_names:
+                bucket_size_bytes = metric_sizes.get(bucket_name, fallback_sizes.get(bucket_name, 0))
+                gcs_usage[bucket_name] = round(bucket_size_bytes * _INV_GB, 2)
+                total_gcs_bytes += bucket_size_bytes
                 
         except Exception as e:
             print(f"GCS 리소스 수집 오류: {e}")
         
-        gcs_usage['total_gcs_gb'] = round(total_gcs_gb, 2)
+        gcs_usage['total_gcs_gb'] = round(total_gcs_bytes * _INV_GB, 2)
         return gcs_usage
 
-def save_to_excel_gcs(result_data, bucket_name=None):
+    def get_gcs_prefix_usage(self, prefixes=None):
+        """GCS 버킷별 폴더(prefix) 용량 (해당 prefix 하위만 나열, 버킷 용량/합계와 별도로 관리)"""
+        prefix_usage = {}
+        if not prefixes:
+            return prefix_usage
+        
+        try:
+            buckets = self.storage_client.list_buckets(project=self.project_id)
+            prefix_keys = [(bucket.name, prefix) for bucket in buckets for prefix in prefixes]
+            
+            with ThreadPoolExecutor(max_workers=_GCS_MAX_WORKERS) as executor:
+                prefix_sizes = executor.map(lambda key: self._get_bucket_size(key[0], prefix=key[1]), prefix_keys)
+                for (bucket_name, prefix), prefix_size_bytes in zip(prefix_keys, prefix_sizes):
+                    prefix_usage[f"{bucket_name}/{prefix}"] = round(prefix_size_bytes * _INV_GB, 2)
+                    
+        except Exception as e:
+            print(f"GCS 폴더 용량 수집 오류: {e}")
+        
+        return prefix_usage
+
+    def _get_bucket_sizes_from_monitoring(self):
+        """Cloud Monitoring storage/total_bytes 지표로 버킷별 용량 (bytes) 조회"""
+        bucket_bytes = {}
+        
+        try:
+            now = int(time.time())
+            interval = monitoring_v3.TimeInterval({
+                'end_time': {'seconds': now},
+                'start_time': {'seconds': now - 24 * 60 * 60}
+            })
+            aggregation = monitoring_v3.Aggregation({
+                'alignment_period': {'seconds': 24 * 60 * 60},
+                'per_series_aligner': monitoring_v3.Aggregation.Aligner.ALIGN_MEAN
+            })
+            time_series = self.monitoring_client.list_time_series(request={
+                'name': f"projects/{self.project_id}",
+                'filter': (
+                    'metric.type = "storage.googleapis.com/storage/total_bytes" AND resource.type = "gcs_bucket" '
+                    f'AND resource.labels.project_id = "{self.project_id}"'
+                ),
+                'interval': interval,
+                'view': monitoring_v3.ListTimeSeriesRequest.TimeSeriesView.FULL,
+                'aggregation': aggregation
+            })
+            
+            # 스토리지 클래스별로 시계열이 나뉘므로 버킷 단위로 합산 (points[0]이 가장 최근 값)
+            for series in time_series:
+                if not series.points:
+                    continue
+                bucket_name = series.resource.labels['bucket_name']
+                bucket_bytes[bucket_name] = bucket_bytes.get(bucket_name, 0) + int(series.points[0].value.double_value)
+                
+        except Exception as e:
+            print(f"Monitoring 버킷 용량 조회 오류: {e}")
+        
+        return bucket_bytes
+
+    def _get_bucket_size(self, bucket_name, prefix=None):
+        """단일 버킷(또는 prefix 하위)의 전체 blob 용량 (bytes)"""
+        bucket_size_bytes = 0
+        print(f"Processing bucket: {bucket_name}" + (f" (prefix: {prefix})" if prefix else ""))
+        
+        try:
+            # size 필드만 받도록 partial response 지정, 페이지당 최대 개수로 왕복 횟수 최소화
+            blobs = self.storage_client.list_blobs(
+                bucket_name,
+                prefix=prefix,
+                fields='items(size),nextPageToken',
+                page_size=1000
+            )
+            bucket_size_bytes = sum(blob.size or 0 for blob in blobs)
+        except Exception as e:
+            print(f"버킷 {bucket_name} 처리 오류: {e}")
+        
+        return bucket_size_bytes
+
+def build_report_rows(result_data):
+    """리포트 행 목록 생성 (태그를 동적 컬럼으로 추가)"""
+    # 1. 모든 인스턴스에서 사용된 태그 키들을 수집
+    all_tag_keys = set()
+    for instance in result_data['instances']:
+        if 'tags' in instance and instance['tags']:
+            all_tag_keys.update(instance['tags'].keys())
+    
+    # 태그 키들을 정렬하여 일관된 순서로 컬럼 생성
+    sorted_tag_keys = sorted(list(all_tag_keys))
+    print(f"Found tag keys: {sorted_tag_keys}")
+    
+    # 데이터 정리
+    all_data = []
+    
+    # 2. 헤더 생성 (기본 컬럼 + 태그 컬럼들)
+    base_headers = ['Category', 'Instance/Resource', 'Zone', 'Machine Type', 'Status', 
+                   'CPU', 'Memory(GB)', 'Private IPs', 'Public IPs',
+                   'PD-Standard(GB)', 'PD-Balanced(GB)', 'PD-SSD(GB)', 'Local-SSD(GB)']
+    
+    # 태그 컬럼들을 헤더에 추가
+    headers = base_headers + sorted_tag_keys
+    all_data.append(headers)
+    
+    # 프로젝트 정보 (태그 컬럼 개수만큼 빈 셀 추가)
+    empty_tag_cells = [''] * len(sorted_tag_keys)
+    all_data.append(['Project Info', result_data['project_id']] + [''] * 11 + empty_tag_cells)
+    all_data.append(['Collection Time', result_data['timestamp']] + [''] * 11 + empty_tag_cells)
+    all_data.append([''] * len(headers))  # 빈 줄
+    
+    # 3. 인스턴스별 상세 정보 (태그 값들 포함)
+    for instance in result_data['instances']:
+        # 기본 정보 (디스크 용량은 리포트 기록 시 한 번만 반올림)
+        disks = instance.get('disks', {})
+        base_row = [
+            'Instance',
+            instance.get('name', 'unknown'),
+            instance.get('zone', ''),
+            instance.get('machine_type', ''),
+            instance.get('status', ''),
+            instance.get('cpu', 0),
+            round(float(instance.get('memory_gb', 0)), 2),
+            instance.get('private_ip', 'None'),
+            instance.get('public_ip', 'None'),
+            round(disks.get('pd-standard', 0), 2),
+            round(disks.get('pd-balanced', 0), 2),
+            round(disks.get('pd-ssd', 0), 2),
+            round(disks.get('local-ssd', 0), 2)
+        ]
+        
+        # 태그 값들 추가 (해당 키가 있으면 값을, 없으면 빈값을)
+        tag_values = []
+        instance_tags = instance.get('tags', {})
+        for tag_key in sorted_tag_keys:
+            tag_values.append(instance_tags.get(tag_key, ''))
+        
+        # 전체 행 생성
+        row = base_row + tag_values
+        all_data.append(row)
+    
+    all_data.append([''] * len(headers))  # 빈 줄
+    
+    # 스냅샷 (태그 컬럼만큼 빈 셀 추가)
+    snapshot_row = ['Snapshot', 'Total Snapshots', '', '', '', '', 
+                   result_data['snapshot_total_gb']] + [''] * 6 + empty_tag_cells
+    all_data.append(snapshot_row)
+    all_data.append([''] * len(headers))  # 빈 줄
+    
+    # GCS Usage (태그 컬럼만큼 빈 셀 추가)
+    gcs_header_row = ['GCS', 'Bucket Name', 'Size(GB)'] + [''] * 10 + empty_tag_cells
+    all_data.append(gcs_header_row)
+    for bucket_name_item, size_gb in result_data['gcs_usage'].items():
+        gcs_row = ['GCS', bucket_name_item, size_gb] + [''] * 10 + empty_tag_cells
+        all_data.append(gcs_row)
+    
+    # GCS 폴더별 용량 (버킷 용량에 이미 포함되므로 별도 섹션으로 분리)
+    gcs_prefix_usage = result_data.get('gcs_prefix_usage')
+    if gcs_prefix_usage:
+        all_data.append([''] * len(headers))  # 빈 줄
+        all_data.append(['GCS Prefix', 'Bucket/Prefix', 'Size(GB)'] + [''] * 10 + empty_tag_cells)
+        for prefix_path, size_gb in gcs_prefix_usage.items():
+            all_data.append(['GCS Prefix', prefix_path, size_gb] + [''] * 10 + empty_tag_cells)
+    
+    return all_data, sorted_tag_keys
+
+def save_to_excel_gcs(result_data, bucket_name=None, storage_client=None):
     """결과를 엑셀 파일로 GCS에 저장 (태그를 동적 컬럼으로 추가)"""
     if bucket_name is None:
         bucket_name = os.environ.get('BUCKET_NAME')
@@ -277,104 +476,90 @@ def save_to_excel_gcs(result_data, bucket_name=None):
             return None
     
     try:
-        storage_client = storage.Client()
+        # 수집기에서 쓰던 클라이언트를 재사용 (인증/연결 설정 중복 방지)
+        if storage_client is None:
+            storage_client = storage.Client()
         bucket = storage_client.bucket(bucket_name)
         
-        # 1. 모든 인스턴스에서 사용된 태그 키들을 수집
-        all_tag_keys = set()
-        for instance in result_data['instances']:
-            if 'tags' in instance and instance['tags']:
-                all_tag_keys.update(instance['tags'].keys())
-        
-        # 태그 키들을 정렬하여 일관된 순서로 컬럼 생성
-        sorted_tag_keys = sorted(list(all_tag_keys))
-        print(f"Found tag keys: {sorted_tag_keys}")
-        
-        # 데이터 정리
-        all_data = []
-        
-        # 2. 헤더 생성 (기본 컬럼 + 태그 컬럼들)
-        base_headers = ['Category', 'Instance/Resource', 'Zone', 'Machine Type', 'Status', 
-                       'CPU', 'Memory(GB)', 'Private IPs', 'Public IPs',
-                       'PD-Standard(GB)', 'PD-Balanced(GB)', 'PD-SSD(GB)', 'Local-SSD(GB)']
-        
-        # 태그 컬럼들을 헤더에 추가
-        headers = base_headers + sorted_tag_keys
-        all_data.append(headers)
+        all_data, sorted_tag_keys = build_report_rows(result_data)
         
-        # 프로젝트 정보 (태그 컬럼 개수만큼 빈 셀 추가)
-        empty_tag_cells = [''] * len(sorted_tag_keys)
-        all_data.append(['Project Info', result_data['project_id']] + [''] * 11 + empty_tag_cells)
-        all_data.append(['Collection Time', result_data['timestamp']] + [''] * 11 + empty_tag_cells)
-        all_data.append([''] * len(headers))  # 빈 줄
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        filename = f"gcp_resources_{result_data['project_id']}_{timestamp}.xlsx"
         
-        # 3. 인스턴스별 상세 정보 (태그 값들 포함)
-        for instance in result_data['instances']:
-            # 기본 정보
-            base_row = [
-                'Instance',
-                instance.get('name', 'unknown'),
-                instance.get('zone', ''),
-                instance.get('machine_type', ''),
-                instance.get('status', ''),
-                instance.get('cpu', 0),
-                round(float(instance.get('memory_gb', 0)), 2),
-                instance.get('private_ip', 'None'),
-                instance.get('public_ip', 'None'),
-                instance.get('disks', {}).get('pd-standard', 0),
-                instance.get('disks', {}).get('pd-balanced', 0),
-                instance.get('disks', {}).get('pd-ssd', 0),
-                instance.get('disks', {}).get('local-ssd', 0)
-            ]
+        # 엑셀을 임시 파일에 먼저 완성한 뒤 업로드 (작성 중 오류 시 불완전한 파일이 버킷에 남지 않도록)
+        # 업로드는 청크 단위 resumable, 항상 새 객체이므로 if_generation_match=0으로 지정해야 실패 시 재시도됨
+        with tempfile.TemporaryFile() as excel_file:
+            # in_memory 옵션은 constant_memory를 무효화하므로 사용하지 않음
+            workbook = xlsxwriter.Workbook(excel_file, {'constant_memory': True})
+            worksheet = workbook.add_worksheet('Report')
+            for row_index, row in enumerate(all_data):
+                worksheet.write_row(row_index, 0, row)
+            workbook.close()
             
-            # 태그 값들 추가 (해당 키가 있으면 값을, 없으면 빈값을)
-            tag_values = []
-            instance_tags = instance.get('tags', {})
-            for tag_key in sorted_tag_keys:
-                tag_values.append(instance_tags.get(tag_key, ''))
-            
-            # 전체 행 생성
-            row = base_row + tag_values
-            all_data.append(row)
+            excel_file.seek(0)
+            blob = bucket.blob(filename, chunk_size=_UPLOAD_CHUNK_SIZE)
+            blob.upload_from_file(excel_file, if_generation_match=0,
+                                  content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
         
-        all_data.append([''] * len(headers))  # 빈 줄
-        
-        # 스냅샷 (태그 컬럼만큼 빈 셀 추가)
-        snapshot_row = ['Snapshot', 'Total Snapshots', '', '', '', '', 
-                       result_data['snapshot_total_gb']] + [''] * 6 + empty_tag_cells
-        all_data.append(snapshot_row)
-        all_data.append([''] * len(headers))  # 빈 줄
-        
-        # GCS Usage (태그 컬럼만큼 빈 셀 추가)
-        gcs_header_row = ['GCS', 'Bucket Name', 'Size(GB)'] + [''] * 10 + empty_tag_cells
-        all_data.append(gcs_header_row)
-        for bucket_name_item, size_gb in result_data['gcs_usage'].items():
-            gcs_row = ['GCS', bucket_name_item, size_gb] + [''] * 10 + empty_tag_cells
-            all_data.append(gcs_row)
+        print(f"✓ 엑셀 파일 저장 완료: gs://{bucket_name}/{filename}")
+        print(f"✓ 태그 컬럼 추가됨: {sorted_tag_keys}")
+        return filename
         
-        # DataFrame 생성 및 엑셀 저장
-        df = pd.DataFrame(all_data)
+    except Exception as e:
+        print(f"엑셀 파일 저장 오류: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def save_to_csv_gcs(result_data, bucket_name=None, storage_client=None):
+    """결과를 CSV 파일로 GCS에 저장 (엑셀이 필요 없는 파이프라인 소비자용)"""
+    if bucket_name is None:
+        bucket_name = os.environ.get('BUCKET_NAME')
+        if not bucket_name:
+            print("ERROR: BUCKET_NAME 환경변수가 설정되지 않았습니다")
+            return None
+    
+    try:
+        # 수집기에서 쓰던 클라이언트를 재사용 (인증/연결 설정 중복 방지)
+        if storage_client is None:
+            storage_client = storage.Client()
+        bucket = storage_client.bucket(bucket_name)
         
-        excel_buffer = BytesIO()
-        df.to_excel(excel_buffer, index=False, header=False, engine='openpyxl')
+        all_data, sorted_tag_keys = build_report_rows(result_data)
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"gcp_resources_{result_data['project_id']}_{timestamp}.xlsx"
+        filename = f"gcp_resources_{result_data['project_id']}_{timestamp}.csv"
         
-        excel_buffer.seek(0)
-        blob = bucket.blob(filename)
-        blob.upload_from_file(excel_buffer, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        # CSV를 임시 파일에 먼저 완성한 뒤 업로드 (작성 중 오류 시 불완전한 파일이 버킷에 남지 않도록)
+        # 업로드는 청크 단위 resumable, 항상 새 객체이므로 if_generation_match=0으로 지정해야 실패 시 재시도됨
+        with tempfile.TemporaryFile('w+', encoding='utf-8', newline='') as csv_file:
+            csv.writer(csv_file).writerows(all_data)
+            csv_file.flush()
+            
+            csv_file.buffer.seek(0)
+            blob = bucket.blob(filename, chunk_size=_UPLOAD_CHUNK_SIZE)
+            blob.upload_from_file(csv_file.buffer, if_generation_match=0, content_type='text/csv')
         
-        print(f"✓ 엑셀 파일 저장 완료: gs://{bucket_name}/{filename}")
+        print(f"✓ CSV 파일 저장 완료: gs://{bucket_name}/{filename}")
         print(f"✓ 태그 컬럼 추가됨: {sorted_tag_keys}")
         return filename
         
     except Exception as e:
-        print(f"엑셀 파일 저장 오류: {e}")
+        print(f"CSV 파일 저장 오류: {e}")
         import traceback
         traceback.print_exc()
         return None
 
+async def collect_all(collector, gcs_prefixes=None):
+    """Compute Engine, 스냅샷, GCS(버킷/폴더) 수집기를 하나의 이벤트 루프에서 동시에 실행"""
+    # compute_v1/storage 클라이언트는 동기 전용이므로 각 수집기를 스레드로 넘겨 I/O 대기를 겹침
+    return await asyncio.gather(
+        asyncio.to_thread(collector.get_compute_resources),
+        asyncio.to_thread(collector.get_snapshot_usage),
+        asyncio.to_thread(collector.get_gcs_usage),
+        asyncio.to_thread(collector.get_gcs_prefix_usage, gcs_prefixes),
+    )
+
 def main():
     """1회성 리소스 수집 실행"""
     project_id = os.environ.get('PROJECT_ID')
@@ -387,31 +572,42 @@ def main():
     try:
         collector = GCPResourceCollector(project_id)
         
-        print("Compute Engine 리소스 수집...")
-        instances = collector.get_compute_resources()
-        print(f"수집된 인스턴스 수: {len(instances)}")
+        # 쉼표로 구분된 GCS_PREFIXES가 있으면 버킷별 폴더 용량도 함께 수집
+        gcs_prefixes = [prefix for prefix in os.environ.get('GCS_PREFIXES', '').split(',') if prefix] or None
         
-        print("스냅샷 리소스 수집...")
-        snapshot_usage = collector.get_snapshot_usage()
+        print("Compute Engine / 스냅샷 / GCS 리소스 동시 수집...")
+        instances, snapshot_usage, gcs_usage, gcs_prefix_usage = asyncio.run(collect_all(collector, gcs_prefixes))
         
-        print("GCS 리소스 수집...")
-        gcs_usage = collector.get_gcs_usage()
+        # 기본 실행에서는 한 줄 요약만 출력 (gcs_usage는 버킷별 항목 + total_gcs_gb)
+        bucket_count = len(gcs_usage) - 1
+        print(f"수집 요약: 인스턴스 {len(instances)}개, 스냅샷 {snapshot_usage}GB, "
+              f"버킷 {bucket_count}개 ({gcs_usage['total_gcs_gb']}GB)")
         
         result = {
             'project_id': project_id,
             'instances': instances,
             'snapshot_total_gb': snapshot_usage,
             'gcs_usage': gcs_usage,
+            'gcs_prefix_usage': gcs_prefix_usage,
             'timestamp': datetime.utcnow().isoformat()
         }
         
-        print("=" * 50)
-        print("GCP 리소스 수집 결과")
-        print("=" * 50)
-        print(json.dumps(result, indent=2, ensure_ascii=False))
-        
-        print("\nGCS에 엑셀 파일 저장 중...")
-        filename = save_to_excel_gcs(result)
+        # 전체 결과 JSON 출력은 VERBOSE 설정 시에만 (대규모 프로젝트에서 로그 부하 방지)
+        if os.environ.get('VERBOSE', '').lower() in ('1', 'true', 'yes'):
+            print("=" * 50)
+            print("GCP 리소스 수집 결과")
+            print("=" * 50)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE))
+            sys.stdout.buffer.flush()
+        
+        output_format = os.environ.get('OUTPUT_FORMAT', 'xlsx').lower()
+        if output_format == 'csv':
+            print("\nGCS에 CSV 파일 저장 중...")
+            filename = save_to_csv_gcs(result, storage_client=collector.storage_client)
+        else:
+            print("\nGCS에 엑셀 파일 저장 중...")
+            filename = save_to_excel_gcs(result, storage_client=collector.storage_client)
         
         if filename:
             print(f"✓ 수집 완료: 버킷에 {filename} 저장됨")